@@ -5,25 +5,35 @@ from __future__ import annotations
 import io
 import os
 import re
-import json
+import sys
+import random
+import threading
+import time
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
-import qrcode
+import segno
 from fpdf import FPDF
 from barcode import Code128
-from barcode.writer import ImageWriter
 
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest, build_http
 from google.oauth2.service_account import Credentials as SACredentials
 from google.oauth2.credentials import Credentials as UserCredentials
 from google.auth.transport.requests import Request
 
+try:
+    import orjson as _json
+except ModuleNotFoundError:
+    import json as _json
+
 try:
     import streamlit as st
 except ModuleNotFoundError:
@@ -59,6 +69,10 @@ def _header_range(title: str) -> str:
     last_col = _column_letter(len(HEADERS) - 1)
     return f"{title}!A1:{last_col}1"
 
+# Tentativas extras (backoff exponencial do googleapiclient) em 429/5xx para leituras e chamadas idempotentes.
+# Appends não usam: uma escrita aplicada cuja resposta se perdeu seria gravada de novo, com outra senha.
+API_RETRIES = int(os.getenv("SHEETS_API_RETRIES", "5"))
+
 # Aba com as áreas/setores
 NOMES_SHEET = os.getenv("NOMES_SHEET", "Nomes")
 
@@ -72,11 +86,24 @@ DEFAULT_LOGO_PATH = Path(__file__).resolve().parent / "assets" / "logo.png"
 PDF_LOGO_PATH = os.getenv("PDF_LOGO_PATH")
 
 
+class _DigitFilter(dict):
+    """Tabela para ``str.translate``: mantém dígitos ASCII e remove qualquer outro caractere."""
+
+    def __missing__(self, codepoint: int) -> None:
+        self[codepoint] = None
+        return None
+
+
+_KEEP_DIGITS = _DigitFilter({cp: cp for cp in range(ord("0"), ord("9") + 1)})
+
+# Tabela para ``str.translate`` que remove todos os caracteres combinantes (acentos após NFKD)
+_STRIP_COMBINING = dict.fromkeys(
+    cp for cp in range(sys.maxunicode + 1) if unicodedata.combining(chr(cp))
+)
+
+
 def _normalize(s: str) -> str:
-    s = s or ""
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
-    return s.strip().lower()
+    return unicodedata.normalize("NFKD", s or "").translate(_STRIP_COMBINING).strip().lower()
 
 
 def format_phone_number(telefone: str) -> str:
@@ -89,15 +116,13 @@ def format_phone_number(telefone: str) -> str:
     if not telefone:
         raise ValueError("Telefone é obrigatório.")
 
-    digits = re.sub(r"\D", "", telefone)
+    digits = telefone.translate(_KEEP_DIGITS)
     if not digits:
         raise ValueError("Telefone deve conter apenas números válidos.")
 
-    # Remove código do país (55) se presente, mantendo 11 dígitos finais
-    if digits.startswith("55") and len(digits) > 11:
-        digits = digits[2:]
-
-    if len(digits) != 11:
+    # Aceita 11 dígitos (DDD + número) ou 13 com o código do país (55) na frente
+    n = len(digits)
+    if n != 11 and not (n == 13 and digits[:2] == "55"):
         raise ValueError("Telefone deve conter 11 dígitos (incluindo DDD).")
 
     numero_local = digits[-9:]
@@ -110,11 +135,18 @@ def format_name_upper(nome: str) -> str:
     return (nome or "").strip().upper()
 
 
+_TRUTHY_NORM = frozenset({"sim", "s", "true", "1", "y", "yes", "ativo", "ativa", "on", "ok"})
+
+
 def _truthy(v: Any) -> bool:
     if isinstance(v, bool):
         return v
-    s = _normalize(str(v))
-    return s in {"sim", "s", "true", "1", "y", "yes", "ativo", "ativa", "on", "ok"}
+    return _normalize(str(v)) in _TRUTHY_NORM
+
+
+# Senha gravada como fórmula ``=ROW()-1`` (1 chamada por envio). Com "Não"/"0"/"false", grava o número
+# literal (append + update da coluna A, 2 chamadas por área).
+SENHA_AS_FORMULA = _truthy(os.getenv("SENHA_AS_FORMULA", "Sim"))
 
 
 def _parse_positive_int(value: Any) -> Optional[int]:
@@ -130,7 +162,7 @@ def _parse_positive_int(value: Any) -> Optional[int]:
         except (TypeError, ValueError):
             return None
     else:
-        s = re.sub(r"\D", "", str(value))
+        s = str(value).translate(_KEEP_DIGITS)
         if not s:
             return None
         try:
@@ -150,7 +182,7 @@ def _authorize_google_sheets():
 
     if sa_json:
         try:
-            info = json.loads(sa_json)
+            info = _json.loads(sa_json)
             creds = SACredentials.from_service_account_info(info, scopes=SCOPES)
             return creds
         except Exception as exc:
@@ -174,7 +206,7 @@ def _authorize_google_sheets():
             creds.refresh(Request())
         else:
             from google_auth_oauthlib.flow import InstalledAppFlow
-            conf = json.loads(client_json)
+            conf = _json.loads(client_json)
             flow = InstalledAppFlow.from_client_config(conf, SCOPES)
             # Em ambiente headless, utiliza run_console()
             creds = flow.run_console()
@@ -184,7 +216,17 @@ def _authorize_google_sheets():
 
 
 def _sheets_service():
-    return build("sheets", "v4", credentials=_authorize_google_sheets(), cache_discovery=False)
+    creds = _authorize_google_sheets()
+    local = threading.local()
+
+    def build_request(http, *args, **kwargs):
+        # httplib2.Http não é thread-safe: cada thread reutiliza a sua própria conexão autorizada
+        thread_http = getattr(local, "http", None)
+        if thread_http is None:
+            thread_http = local.http = AuthorizedHttp(creds, http=build_http())
+        return HttpRequest(thread_http, *args, **kwargs)
+
+    return build("sheets", "v4", credentials=creds, requestBuilder=build_request, static_discovery=True)
 
 
 def _get_spreadsheet_id() -> str:
@@ -203,18 +245,41 @@ def _get_spreadsheet_id() -> str:
     return sid
 
 
-def _find_col_indexes(header_row: List[str], candidates: List[str]) -> Optional[int]:
-    norm = [_normalize(h) for h in header_row]
-    for want in candidates:
-        want_n = _normalize(want)
-        for idx, col in enumerate(norm):
-            if col == want_n:
-                return idx
+@lru_cache(maxsize=1)
+def get_spreadsheet_id() -> str:
+    """``_get_spreadsheet_id`` resolvido uma única vez por processo."""
+    return _get_spreadsheet_id()
+
+
+# Candidatos de cabeçalho da aba NOMES, já normalizados
+_AREA_CANDS = [_normalize(x) for x in ("Área", "Area", "Setor", "Mesa", "Área/Setor")]
+_ABA_CANDS = [_normalize(x) for x in ("Aba", "Sheet", "AbaDestino", "Aba Destino", "Destino", "Guia", "Tab")]
+_ATIVA_CANDS = [_normalize(x) for x in ("Ativa", "Ativo", "Status", "Habilitada", "Disponível")]
+_MAX_CANDS = [_normalize(x) for x in (
+    "Quantidade máxima de senhas",
+    "Qtd máxima",
+    "Qtd Senhas",
+    "Limite",
+)]
+
+
+def _header_index(header_row: List[str]) -> Dict[str, int]:
+    """Normaliza o cabeçalho uma única vez (nome normalizado → primeira coluna)."""
+    norm_index: Dict[str, int] = {}
+    for idx, h in enumerate(header_row):
+        norm_index.setdefault(_normalize(h), idx)
+    return norm_index
+
+
+def _find_col_indexes(norm_index: Dict[str, int], candidates_norm: List[str]) -> Optional[int]:
+    for want in candidates_norm:
+        if want in norm_index:
+            return norm_index[want]
     return None
 
 
 def _get_sheet_metadata(service, spreadsheet_id: str) -> Dict[str, Any]:
-    meta = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
+    meta = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute(num_retries=API_RETRIES)
     return meta
 
 
@@ -234,20 +299,20 @@ def ensure_area_sheet(service, spreadsheet_id: str, title: str) -> None:
         service.spreadsheets().batchUpdate(
             spreadsheetId=spreadsheet_id,
             body={"requests": [{"addSheet": {"properties": {"title": title}}}]},
-        ).execute()
+        ).execute(num_retries=API_RETRIES)
         # escreve cabeçalho
         service.spreadsheets().values().update(
             spreadsheetId=spreadsheet_id,
             range=_header_range(title),
             valueInputOption="RAW",
             body={"values": [HEADERS]},
-        ).execute()
+        ).execute(num_retries=API_RETRIES)
         return
     # se já existe, valida cabeçalho (não falha se estiver diferente; apenas atualiza se vazio)
     rng = service.spreadsheets().values().get(
         spreadsheetId=spreadsheet_id,
         range=f"{title}!1:1",
-    ).execute()
+    ).execute(num_retries=API_RETRIES)
     row1 = rng.get("values", [[]])
     if not row1 or not row1[0]:
         service.spreadsheets().values().update(
@@ -255,73 +320,268 @@ def ensure_area_sheet(service, spreadsheet_id: str, title: str) -> None:
             range=_header_range(title),
             valueInputOption="RAW",
             body={"values": [HEADERS]},
-        ).execute()
+        ).execute(num_retries=API_RETRIES)
+
+
+# Cache (por processo) de título → sheetId e das abas com cabeçalho já validado
+_SHEET_IDS_CACHE: Dict[str, Dict[str, int]] = {}
+_HEADER_CHECKED: Dict[str, set] = {}
+
 
+def _get_sheet_ids(service, spreadsheet_id: str, refresh: bool = False) -> Dict[str, int]:
+    """Mapeia título → sheetId com um único ``spreadsheets.get`` memoizado."""
+    if refresh or spreadsheet_id not in _SHEET_IDS_CACHE:
+        meta = service.spreadsheets().get(
+            spreadsheetId=spreadsheet_id,
+            fields="sheets.properties(sheetId,title)",
+        ).execute(num_retries=API_RETRIES)
+        ids: Dict[str, int] = {}
+        for s in meta.get("sheets", []):
+            props = s.get("properties", {})
+            if "title" in props:
+                ids[props["title"]] = int(props.get("sheetId", 0))
+        _SHEET_IDS_CACHE[spreadsheet_id] = ids
+        _HEADER_CHECKED.pop(spreadsheet_id, None)
+    return _SHEET_IDS_CACHE[spreadsheet_id]
+
+
+def _string_cells(values: List[Any]) -> Dict[str, Any]:
+    cells = []
+    for v in values:
+        text = "" if v is None else str(v)
+        cells.append({"userEnteredValue": {"stringValue": text}} if text else {})
+    return {"values": cells}
+
+
+def _ticket_row_data(row_values: List[Any]) -> Dict[str, Any]:
+    """Linha do ticket com a Senha calculada pelo próprio Sheets (``=ROW()-1``)."""
+    row = _string_cells(list(row_values[1:]))
+    row["values"].insert(0, {"userEnteredValue": {"formulaValue": "=ROW()-1"}})
+    return row
+
+
+def _last_filled_row(sheet: Dict[str, Any]) -> Optional[int]:
+    """Retorna o número (1-based) da última linha preenchida na coluna A."""
+    for grid in sheet.get("data", []):
+        start = int(grid.get("startRow", 0))
+        rows = grid.get("rowData", [])
+        for offset in range(len(rows) - 1, -1, -1):
+            if any(cell.get("effectiveValue") for cell in rows[offset].get("values", [])):
+                return start + offset + 1
+    return None
+
+
+def _append_tickets_once(
+    service,
+    spreadsheet_id: str,
+    entries: List[Tuple[str, List[Any]]],
+    sheet_ids: Dict[str, int],
+) -> List[int]:
+    titles = list(dict.fromkeys(title for title, _ in entries))
+    checked = _HEADER_CHECKED.setdefault(spreadsheet_id, set())
+
+    # Abas existentes ainda não validadas: lê a linha 1 de todas de uma vez
+    needs_header = set()
+    to_check = [t for t in titles if t in sheet_ids and t not in checked]
+    if to_check:
+        res = service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=[f"{t}!1:1" for t in to_check],
+        ).execute(num_retries=API_RETRIES)
+        for title, vr in zip(to_check, res.get("valueRanges", [])):
+            row1 = vr.get("values", [[]])
+            if not row1 or not row1[0]:
+                needs_header.add(title)
+
+    requests: List[Dict[str, Any]] = []
+    target_ids = dict(sheet_ids)
+    used_ids = set(sheet_ids.values())
+    for title in titles:
+        if title in target_ids:
+            continue
+        new_id = random.randint(1, 2**31 - 1)
+        while new_id in used_ids:
+            new_id = random.randint(1, 2**31 - 1)
+        used_ids.add(new_id)
+        target_ids[title] = new_id
+        needs_header.add(title)
+        requests.append({"addSheet": {"properties": {"sheetId": new_id, "title": title}}})
+
+    for title in titles:
+        if title in needs_header:
+            requests.append({
+                "updateCells": {
+                    "start": {"sheetId": target_ids[title], "rowIndex": 0, "columnIndex": 0},
+                    "rows": [_string_cells(HEADERS)],
+                    "fields": "userEnteredValue",
+                }
+            })
+
+    for title, row_values in entries:
+        requests.append({
+            "appendCells": {
+                "sheetId": target_ids[title],
+                "rows": [_ticket_row_data(row_values)],
+                "fields": "userEnteredValue",
+            }
+        })
+
+    result = service.spreadsheets().batchUpdate(
+        spreadsheetId=spreadsheet_id,
+        body={
+            "requests": requests,
+            "includeSpreadsheetInResponse": True,
+            "responseRanges": [f"{t}!A:A" for t in titles],
+            "responseIncludeGridData": True,
+        },
+        fields="updatedSpreadsheet(sheets(properties(title),data(startRow,rowData(values(effectiveValue)))))",
+    ).execute()  # sem num_retries: repetir após 5xx/timeout poderia duplicar as linhas (ver _retry_on_429)
+
+    sheet_ids.update(target_ids)
+    checked.update(titles)
+
+    last_rows: Dict[str, int] = {}
+    for sheet in (result or {}).get("updatedSpreadsheet", {}).get("sheets", []):
+        title = sheet.get("properties", {}).get("title")
+        if title in target_ids:
+            last_row = _last_filled_row(sheet)
+            if last_row is not None:
+                last_rows[title] = last_row
+
+    # Mais de uma entrada na mesma aba ocupa as últimas linhas, na ordem do pedido
+    remaining = {t: sum(1 for title, _ in entries if title == t) for t in titles}
+    senhas: List[int] = []
+    for title, _ in entries:
+        if title not in last_rows:
+            raise RuntimeError(f"Não foi possível detectar a linha inserida na aba '{title}'.")
+        remaining[title] -= 1
+        row_idx_int = last_rows[title] - remaining[title]
+        # Cabeçalho está na linha 1 → senha = row_idx - 1
+        senhas.append(max(1, row_idx_int - 1))
+    return senhas
+
+
+def append_tickets(service, spreadsheet_id: str, entries: List[Tuple[str, List[Any]]]) -> List[int]:
+    """
+    Grava vários tickets com um único ``spreadsheets.batchUpdate`` e devolve as senhas, na ordem de ``entries``.
+    Cada entrada é ``(aba, linha)``; abas ausentes são criadas (com cabeçalho) no mesmo lote e a coluna
+    Senha recebe ``=ROW()-1``, dispensando o ``values.update`` posterior.
+    """
+    if not entries:
+        return []
+    sheet_ids = _get_sheet_ids(service, spreadsheet_id)
+    try:
+        return _append_tickets_once(service, spreadsheet_id, entries, sheet_ids)
+    except HttpError as exc:
+        # O lote é atômico: se o cache de abas estiver desatualizado, relê e tenta uma vez mais
+        if getattr(exc, "resp", None) is None or exc.resp.status != 400:
+            raise
+    sheet_ids = _get_sheet_ids(service, spreadsheet_id, refresh=True)
+    return _append_tickets_once(service, spreadsheet_id, entries, sheet_ids)
+
+
+def read_areas_and_bairros(service, spreadsheet_id: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Lê as abas de áreas e de bairros com um único ``batchGet``.
 
-def read_active_areas(service, spreadsheet_id: str) -> List[Dict[str, Any]]:
+    Se o lote falhar (ex.: aba de bairros ausente), lê só as áreas e devolve a lista de bairros vazia,
+    para que a UI caia no campo de bairro manual.
+    """
+    try:
+        result = service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=[f"{NOMES_SHEET}!A:Z", f"{BAIRROS_SHEET}!A:A"],
+        ).execute(num_retries=API_RETRIES)
+    except HttpError as exc:
+        # 400 = intervalo inválido (ex.: aba de bairros ausente); cota/5xx/permissão seguem como erro
+        if getattr(exc, "resp", None) is None or exc.resp.status != 400:
+            raise RuntimeError(f"Erro ao ler as abas '{NOMES_SHEET}'/'{BAIRROS_SHEET}': {exc}") from exc
+        return read_active_areas(service, spreadsheet_id), []
+
+    value_ranges = result.get("valueRanges", [])
+    nomes_rows = value_ranges[0].get("values", []) if len(value_ranges) > 0 else []
+    bairros_rows = value_ranges[1].get("values", []) if len(value_ranges) > 1 else []
+    areas = read_active_areas(service, spreadsheet_id, values=nomes_rows)
+    bairros = read_neighborhoods(service, spreadsheet_id, values=bairros_rows)
+    return areas, bairros
+
+
+def read_active_areas(
+    service,
+    spreadsheet_id: str,
+    values: Optional[List[List[str]]] = None,
+) -> List[Dict[str, Any]]:
     """
     Lê a aba NOMES (por padrão 'Nomes') e retorna apenas as áreas ativas.
     Campos aceitos (case/acento-insensitive):
       - Área (ou Area, Setor, Mesa)
       - Aba (ou Sheet, AbaDestino, Destino) — se ausente, usa o mesmo texto da Área
       - Ativa (ou Status) — valores: Sim/Nao, True/False, 1/0, Ativo/Inativo
+    Se ``values`` for informado (linhas já lidas), nenhuma chamada à API é feita.
     """
-    try:
-        result = service.spreadsheets().values().get(
-            spreadsheetId=spreadsheet_id,
-            range=f"{NOMES_SHEET}!A:Z",
-        ).execute()
-    except HttpError as exc:
-        raise RuntimeError(f"Erro ao ler a aba '{NOMES_SHEET}': {exc}") from exc
-
-    rows = result.get("values", [])
+    if values is None:
+        try:
+            result = service.spreadsheets().values().get(
+                spreadsheetId=spreadsheet_id,
+                range=f"{NOMES_SHEET}!A:Z",
+            ).execute(num_retries=API_RETRIES)
+        except HttpError as exc:
+            raise RuntimeError(f"Erro ao ler a aba '{NOMES_SHEET}': {exc}") from exc
+        values = result.get("values", [])
+
+    rows = values
     if not rows:
         return []
 
     header = rows[0]
-    area_idx = _find_col_indexes(header, ["Área", "Area", "Setor", "Mesa", "Área/Setor"])
-    aba_idx = _find_col_indexes(header, ["Aba", "Sheet", "AbaDestino", "Aba Destino", "Destino", "Guia", "Tab"])
-    ativa_idx = _find_col_indexes(header, ["Ativa", "Ativo", "Status", "Habilitada", "Disponível"])
-    max_idx = _find_col_indexes(header, [
-        "Quantidade máxima de senhas",
-        "Qtd máxima",
-        "Qtd Senhas",
-        "Limite",
-    ])
+    norm_index = _header_index(header)
+    area_idx = _find_col_indexes(norm_index, _AREA_CANDS)
+    aba_idx = _find_col_indexes(norm_index, _ABA_CANDS)
+    ativa_idx = _find_col_indexes(norm_index, _ATIVA_CANDS)
+    max_idx = _find_col_indexes(norm_index, _MAX_CANDS)
 
     if area_idx is None:
         raise RuntimeError("Coluna 'Área' (ou equivalente) não encontrada na aba 'Nomes'.")
 
     areas: List[Dict[str, Any]] = []
     for row in rows[1:]:
+        # Sem coluna "Ativa" (ou célula vazia no fim da linha) → considera ativa, sem normalizar nada
+        if ativa_idx is not None and ativa_idx < len(row):
+            if not _truthy(row[ativa_idx]):
+                continue
         area = (row[area_idx] if area_idx < len(row) else "").strip()
         if not area:
             continue
         sheet_title = (row[aba_idx] if (aba_idx is not None and aba_idx < len(row)) else area).strip() or area
-        ativa_val = (row[ativa_idx] if (ativa_idx is not None and ativa_idx < len(row)) else "Sim")
         max_val = row[max_idx] if (max_idx is not None and max_idx < len(row)) else None
-        ativa = _truthy(ativa_val)
-        if ativa:
-            areas.append({
-                "area": area,
-                "sheet": sheet_title,
-                "ativa": True,
-                "max_senhas": _parse_positive_int(max_val),
-            })
+        areas.append({
+            "area": area,
+            "sheet": sheet_title,
+            "ativa": True,
+            "max_senhas": _parse_positive_int(max_val),
+        })
     return areas
 
 
-def read_neighborhoods(service, spreadsheet_id: str) -> List[str]:
-    """Lê a aba de bairros e devolve uma lista com os nomes válidos."""
-    try:
-        result = service.spreadsheets().values().get(
-            spreadsheetId=spreadsheet_id,
-            range=f"{BAIRROS_SHEET}!A:A",
-        ).execute()
-    except HttpError as exc:
-        raise RuntimeError(f"Erro ao ler a aba '{BAIRROS_SHEET}': {exc}") from exc
+def read_neighborhoods(
+    service,
+    spreadsheet_id: str,
+    values: Optional[List[List[str]]] = None,
+) -> List[str]:
+    """Lê a aba de bairros e devolve uma lista com os nomes válidos.
 
-    rows = result.get("values", [])
+    Se ``values`` for informado (linhas já lidas), nenhuma chamada à API é feita.
+    """
+    if values is None:
+        try:
+            result = service.spreadsheets().values().get(
+                spreadsheetId=spreadsheet_id,
+                range=f"{BAIRROS_SHEET}!A:A",
+            ).execute(num_retries=API_RETRIES)
+        except HttpError as exc:
+            raise RuntimeError(f"Erro ao ler a aba '{BAIRROS_SHEET}': {exc}") from exc
+        values = result.get("values", [])
+
+    rows = values
     if not rows:
         return []
 
@@ -337,27 +597,54 @@ def read_neighborhoods(service, spreadsheet_id: str) -> List[str]:
     return bairros
 
 
+def get_sheets_service():
+    """Cliente do Sheets reaproveitado entre reruns (``st.cache_resource``)."""
+    return _sheets_service()
+
+
+def cached_read_areas_and_bairros(spreadsheet_id: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Versão de ``read_areas_and_bairros`` com cache de 60s (``st.cache_data``)."""
+    return read_areas_and_bairros(get_sheets_service(), spreadsheet_id)
+
+
+if st is not None:
+    # Cliente compartilhado entre sessões (threads): seguro porque ``_sheets_service`` usa um
+    # ``requestBuilder`` com uma conexão HTTP por thread
+    get_sheets_service = st.cache_resource(show_spinner=False)(get_sheets_service)
+    cached_read_areas_and_bairros = st.cache_data(ttl=60, show_spinner=False)(cached_read_areas_and_bairros)
+
+
+# Linha inicial de um 'updatedRange' ("Aba!A5:H5" ou "Aba!A5")
+_UPDATED_RANGE_RE = re.compile(r"!.*?(\d+)(?::|$)")
+
+
 def append_ticket_and_get_number(service, spreadsheet_id: str, sheet_title: str, row_values: List[str]) -> int:
     """
-    Faz append da linha (com Senha vazia) e retorna o número da senha atribuído com base no índice da linha.
-    Estratégia: append → extrair 'updatedRange' → calcular row_idx → Senha = row_idx - 1 → update célula A{row_idx}
+    Faz append da linha e retorna o número da senha atribuído com base no índice da linha.
+    Com ``SENHA_AS_FORMULA`` ligado, delega a ``append_tickets`` (Senha = ``=ROW()-1``, uma chamada).
+    Desligado: append (Senha vazia) → extrair 'updatedRange' → row_idx → Senha = row_idx - 1 → update A{row_idx}.
     """
+    if SENHA_AS_FORMULA:
+        return _retry_on_429(append_tickets, service, spreadsheet_id, [(sheet_title, row_values)])[0]
+
     # Garante a aba e cabeçalhos
     ensure_area_sheet(service, spreadsheet_id, sheet_title)
 
     # Append mantém a coluna Senha vazia (índice 0) para ser atualizada após o append
     body = {"values": [row_values]}
-    append_result = service.spreadsheets().values().append(
+    append_request = service.spreadsheets().values().append(
         spreadsheetId=spreadsheet_id,
         range=f"{sheet_title}!A1",
         valueInputOption="RAW",
         insertDataOption="INSERT_ROWS",
         body=body,
-    ).execute()
+    )
+    # sem num_retries: repetir após 5xx/timeout poderia duplicar a linha; só 429 é repetido
+    append_result = _retry_on_429(append_request.execute)
 
     updated_range = (append_result or {}).get("updates", {}).get("updatedRange", "")
     # extrai o número da última linha gravada (mesma técnica usada em utilidades similares)
-    m = re.search(r"!.*?(\d+):", updated_range) or re.search(r"!.*?(\d+)$", updated_range)
+    m = _UPDATED_RANGE_RE.search(updated_range)
     if not m:
         raise RuntimeError(f"Não foi possível detectar a linha inserida: {updated_range}")
     row_idx_int = int(m.group(1))
@@ -371,11 +658,56 @@ def append_ticket_and_get_number(service, spreadsheet_id: str, sheet_title: str,
         range=f"{sheet_title}!A{row_idx_int}",
         valueInputOption="RAW",
         body={"values": [[str(senha_num)]]},
-    ).execute()
+    ).execute(num_retries=API_RETRIES)
 
     return senha_num
 
 
+def _retry_on_429(fn, *args, attempts: int = 3):
+    """Repete ``fn`` quando a cota do Sheets estoura (HTTP 429), com espera exponencial + jitter.
+
+    Um 429 garante que nada foi gravado; usar apenas com uma única escrita atômica por chamada
+    (``append_tickets`` ou o ``values.append`` de ``append_ticket_and_get_number``), para não duplicar linhas.
+    """
+    for n in range(attempts):
+        try:
+            return fn(*args)
+        except HttpError as exc:
+            status = getattr(getattr(exc, "resp", None), "status", None)
+            if status != 429 or n == attempts - 1:
+                raise
+            time.sleep(2 ** n + random.random())
+
+
+def _append_one(service, spreadsheet_id: str, sheet_title: str, rows: List[List[str]]) -> List[int]:
+    return [append_ticket_and_get_number(service, spreadsheet_id, sheet_title, row) for row in rows]
+
+
+def append_tickets_parallel(service, spreadsheet_id: str, entries: List[Tuple[str, List[str]]]) -> List[int]:
+    """
+    Grava os tickets com ``append_ticket_and_get_number`` em paralelo (uma thread por aba) e devolve
+    as senhas na ordem de ``entries``. Entradas da mesma aba ficam na mesma thread, em ordem, para não
+    disputarem a criação da aba.
+    """
+    by_sheet: Dict[str, List[int]] = {}
+    for pos, (sheet_title, _) in enumerate(entries):
+        by_sheet.setdefault(sheet_title, []).append(pos)
+    if not by_sheet:
+        return []
+
+    titles = list(by_sheet)
+    senhas: List[int] = [0] * len(entries)
+    with ThreadPoolExecutor(max_workers=min(8, len(titles))) as ex:
+        results = ex.map(
+            lambda title: _append_one(service, spreadsheet_id, title, [entries[p][1] for p in by_sheet[title]]),
+            titles,
+        )
+        for title, nums in zip(titles, results):
+            for pos, senha_num in zip(by_sheet[title], nums):
+                senhas[pos] = senha_num
+    return senhas
+
+
 def now_str(tz_name: str = DEFAULT_TIMEZONE) -> str:
     try:
         tz = ZoneInfo(tz_name)
@@ -425,7 +757,44 @@ def _load_logo_bytes() -> Optional[bytes]:
         return None
 
 
-def _render_ticket_page(pdf: FPDF, data: Dict[str, str]) -> None:
+def _logo_buffer() -> Optional[io.BytesIO]:
+    logo_bytes = _load_logo_bytes()
+    if not logo_bytes:
+        return None
+    buf_logo = io.BytesIO(logo_bytes)
+    buf_logo.name = "logo.png"
+    return buf_logo
+
+
+def _draw_barcode(pdf: FPDF, pattern: str, x: float, y: float, w: float, h: float) -> None:
+    """Desenha o padrão 0/1 do Code128 com retângulos (uma barra por sequência de '1')."""
+    module = w / len(pattern)
+    pdf.set_fill_color(0, 0, 0)
+    start = None
+    for i, bit in enumerate(pattern + "0"):
+        if bit == "1" and start is None:
+            start = i
+        elif bit != "1" and start is not None:
+            pdf.rect(x + start * module, y, (i - start) * module, h, style="F")
+            start = None
+
+
+def _draw_qr(pdf: FPDF, matrix, x: float, y: float, size: float, border: int = 4) -> None:
+    """Desenha a matriz do QR (com zona de silêncio de ``border`` módulos) unindo módulos escuros por linha."""
+    cell = size / (len(matrix) + 2 * border)
+    pdf.set_fill_color(0, 0, 0)
+    for row_idx, row in enumerate(matrix):
+        row_y = y + (row_idx + border) * cell
+        start = None
+        for col_idx, dark in enumerate(list(row) + [0]):
+            if dark and start is None:
+                start = col_idx
+            elif not dark and start is not None:
+                pdf.rect(x + (start + border) * cell, row_y, (col_idx - start) * cell, cell, style="F")
+                start = None
+
+
+def _render_ticket_page(pdf: FPDF, data: Dict[str, str], logo: Optional[io.BytesIO] = None) -> None:
     area = str(data.get("area", "Área")).strip()
     senha = str(data.get("senha", "0")).strip()
     nome = format_name_upper(data.get("nome", ""))
@@ -433,32 +802,17 @@ def _render_ticket_page(pdf: FPDF, data: Dict[str, str]) -> None:
     bairro = str(data.get("bairro", "")).strip()
     ts = str(data.get("ts_registro", "")).strip()
 
-    # QR (conteúdo: "AREA|SENHA|NOME")
-    qr_payload = f"{area}|{senha}|{nome}"
-    qr_img = qrcode.make(qr_payload)
-    buf_qr = io.BytesIO()
-    qr_img.save(buf_qr, format="PNG")
-    buf_qr.seek(0)
-
-    # Code128 com a senha
-    buf_bar = io.BytesIO()
-    Code128(senha, writer=ImageWriter()).write(buf_bar, options={
-        "module_width": 0.3,
-        "module_height": 12,
-        "font_size": 8,
-    })
-    buf_bar.seek(0)
+    # QR (conteúdo: "AREA|SENHA|NOME") e Code128 com a senha
+    qr_matrix = segno.make(f"{area}|{senha}|{nome}", error="m", micro=False).matrix
+    bar_pattern = Code128(senha).build()[0]
 
     pdf.add_page()
 
-    logo_bytes = _load_logo_bytes()
-    if logo_bytes:
-        buf_logo = io.BytesIO(logo_bytes)
-        buf_logo.name = "logo.png"
+    if logo is not None:
         logo_width = 36
         logo_x = (80 - logo_width) / 2
         y_before = pdf.get_y()
-        pdf.image(buf_logo, x=logo_x, y=y_before, w=logo_width)
+        pdf.image(logo, x=logo_x, y=y_before, w=logo_width)
         pdf.set_y(y_before + logo_width + 2)
 
     # Cabeçalho
@@ -476,9 +830,9 @@ def _render_ticket_page(pdf: FPDF, data: Dict[str, str]) -> None:
     # Barra + QR
     x = pdf.get_x()
     y = pdf.get_y()
-    pdf.image(buf_bar, x=x + 10, y=y, w=50)
+    _draw_barcode(pdf, bar_pattern, x=x + 10, y=y, w=50, h=14)
     pdf.ln(18)
-    pdf.image(buf_qr, x=(80 - 30) / 2, y=pdf.get_y() + 2, w=30)
+    _draw_qr(pdf, qr_matrix, x=(80 - 30) / 2, y=pdf.get_y() + 2, size=30)
     pdf.ln(30)
 
     # Dados do participante
@@ -495,24 +849,26 @@ def _render_ticket_page(pdf: FPDF, data: Dict[str, str]) -> None:
 
 
 def _pdf_bytes(pdf: FPDF) -> bytes:
-    raw = pdf.output(dest="S")
-    return bytes(raw) if isinstance(raw, (bytes, bytearray)) else str(raw).encode("latin-1")
+    # fpdf2 devolve ``bytearray``; ``bytes`` é exigido pelo ``st.download_button`` (str só em FPDF antigo)
+    raw = pdf.output()
+    return bytes(raw) if isinstance(raw, (bytes, bytearray)) else raw.encode("latin-1")
 
 
 def generate_ticket_pdf(data: Dict[str, str]) -> bytes:
     """Gera um PDF de ticket único."""
 
     pdf = _init_ticket_pdf()
-    _render_ticket_page(pdf, data)
+    _render_ticket_page(pdf, data, logo=_logo_buffer())
     return _pdf_bytes(pdf)
 
 
 def generate_tickets_pdf(tickets: List[Dict[str, str]]) -> bytes:
-    """Gera um PDF com uma página por ticket."""
+    """Gera um PDF com uma página por ticket (logo carregado uma única vez para todas)."""
 
     pdf = _init_ticket_pdf()
+    logo = _logo_buffer()
     for ticket in tickets:
-        _render_ticket_page(pdf, ticket)
+        _render_ticket_page(pdf, ticket, logo=logo)
     return _pdf_bytes(pdf)
 
 
@@ -529,14 +885,19 @@ def submit_tickets(
     if not areas:
         raise ValueError("Selecione ao menos uma área ativa.")
 
-    service = _sheets_service()
-    spreadsheet_id = _get_spreadsheet_id()
+    service = get_sheets_service()
+    spreadsheet_id = get_spreadsheet_id()
 
     # Consulta áreas ativas e mapeamento area->sheet
     areas_info = read_active_areas(service, spreadsheet_id)
     map_area_sheet = {a["area"]: a["sheet"] for a in areas_info}
     map_area_limit = {a["area"]: a.get("max_senhas") for a in areas_info}
 
+    # A lista da UI pode estar até 60s desatualizada (cache): recusa áreas desativadas nesse intervalo
+    inativas = [area for area in areas if area not in map_area_sheet]
+    if inativas:
+        raise ValueError(f"Área(s) não está(ão) mais ativa(s): {', '.join(inativas)}.")
+
     nome_fmt = format_name_upper(nome)
     if not nome_fmt:
         raise ValueError("Nome é obrigatório.")
@@ -550,9 +911,10 @@ def submit_tickets(
     tickets_payload: List[Dict[str, str]] = []
     excedidas: List[Dict[str, Any]] = []
 
+    ts = now_str()
+    entries: List[Tuple[str, List[str]]] = []
     for area in areas:
-        sheet_title = map_area_sheet.get(area) or area
-        ts = now_str()
+        sheet_title = map_area_sheet[area]
         row = [
             "",
             nome_fmt,
@@ -563,8 +925,14 @@ def submit_tickets(
             ts,
             "",
         ]
-        senha_num = append_ticket_and_get_number(service, spreadsheet_id, sheet_title, row)
+        entries.append((sheet_title, row))
+
+    if SENHA_AS_FORMULA:
+        senhas = _retry_on_429(append_tickets, service, spreadsheet_id, entries)
+    else:
+        senhas = append_tickets_parallel(service, spreadsheet_id, entries)
 
+    for area, (sheet_title, _), senha_num in zip(areas, entries, senhas):
         registro = {
             "area": area,
             "sheet": sheet_title,
@@ -0,0 +1,96 @@
+# event_utils_fast.py — normalização em lote (importações/migrações de planilhas antigas)
+#
+# Os caminhos de um único valor continuam em ``event_utils`` (Python puro): para um telefone só,
+# o custo de despacho do Numba não compensa. Aqui os laços por caractere rodam compilados com
+# ``numba.njit(cache=True)`` sobre buffers ``uint8``; sem Numba instalado, as mesmas funções
+# rodam em Python puro.
+from __future__ import annotations
+
+import unicodedata
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+try:
+    from numba import njit
+except ModuleNotFoundError:
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+
+@njit(cache=True)
+def _is_space(c) -> bool:
+    # Mesmos caracteres ASCII que ``str.strip()`` remove: \t..\r, separadores 0x1C..0x1F e espaço
+    return c == 32 or 9 <= c <= 13 or 28 <= c <= 31
+
+
+@njit(cache=True)
+def keep_digits_last_n(arr, n):
+    """Devolve (em ordem) os últimos ``n`` dígitos ASCII de ``arr``."""
+    out = np.empty(n, dtype=np.uint8)
+    count = 0
+    for i in range(arr.shape[0] - 1, -1, -1):
+        c = arr[i]
+        if 48 <= c <= 57:
+            if count == n:
+                break
+            out[n - 1 - count] = c
+            count += 1
+    return out[n - count:]
+
+
+@njit(cache=True)
+def lower_strip_ascii(arr):
+    """Remove espaços das pontas e converte para minúsculas um buffer já restrito a ASCII."""
+    start = 0
+    end = arr.shape[0]
+    while start < end and _is_space(arr[start]):
+        start += 1
+    while end > start and _is_space(arr[end - 1]):
+        end -= 1
+    out = np.empty(end - start, dtype=np.uint8)
+    j = 0
+    for i in range(start, end):
+        c = arr[i]
+        if 65 <= c <= 90:
+            c += 32
+        out[j] = c
+        j += 1
+    return out[:j]
+
+
+def _ascii_buffer(text: str) -> np.ndarray:
+    return np.frombuffer(text.encode("ascii", "ignore"), dtype=np.uint8)
+
+
+def format_phones_bulk(series: Iterable[str]) -> List[Optional[str]]:
+    """Versão em lote de ``format_phone_number``; telefones inválidos viram ``None``."""
+
+    formatted: List[Optional[str]] = []
+    for telefone in series:
+        # 14 dígitos bastam para distinguir "13 com código do país" de "números demais"
+        digits = keep_digits_last_n(_ascii_buffer(str(telefone or "")), 14).tobytes().decode("ascii")
+        n = len(digits)
+        if n != 11 and not (n == 13 and digits[:2] == "55"):
+            formatted.append(None)
+            continue
+        numero_local = digits[-9:]
+        formatted.append(f"(92) {numero_local[:5]}-{numero_local[5:]}")
+    return formatted
+
+
+def normalize_ascii_bulk(series: Iterable[str]) -> List[str]:
+    """Versão em lote e só-ASCII de ``_normalize``.
+
+    Acentos saem via NFKD como em ``_normalize``, mas caracteres que o NFKD não decompõe em ASCII
+    ("ß", "ø", letras não latinas) são descartados — o resultado só coincide com ``_normalize``
+    para textos que viram ASCII puro após o NFKD.
+    """
+
+    normalized: List[str] = []
+    for s in series:
+        buf = _ascii_buffer(unicodedata.normalize("NFKD", str(s or "")))
+        normalized.append(lower_strip_ascii(buf).tobytes().decode("ascii"))
+    return normalized
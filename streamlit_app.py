@@ -29,18 +29,16 @@ def enviar_para_impressao(pdf_bytes: bytes) -> tuple[bool, str | None]:
         return False, str(e)
 
 from event_utils import (
-    read_active_areas,
-    read_neighborhoods,
+    cached_read_areas_and_bairros,
     submit_tickets,
     format_phone_number,
-    _sheets_service,
-    _get_spreadsheet_id,
+    get_spreadsheet_id,
 )
 
 st.set_page_config(page_title="Distribuidor de Senhas — Evento", page_icon="🎟️", layout="centered")
 st.title("🎟️ Distribuidor de Senhas — Evento")
 
-st.caption(f"Planilha conectada: `{_get_spreadsheet_id()}` (definida no código)")
+st.caption(f"Planilha conectada: `{get_spreadsheet_id()}` (definida no código)")
 
 # Ajuda rápida
 with st.expander("Como funciona?"):
@@ -59,10 +57,8 @@ with st.expander("Como funciona?"):
 areas_opts: List[Dict] = []
 bairros_opts: List[str] = []
 try:
-    service = _sheets_service()
-    sid = _get_spreadsheet_id()
-    areas_opts = read_active_areas(service, sid)
-    bairros_opts = read_neighborhoods(service, sid)
+    sid = get_spreadsheet_id()
+    areas_opts, bairros_opts = cached_read_areas_and_bairros(sid)
 except Exception as e:
     st.error(f"⚠️ Não foi possível ler a planilha: {e}")
 
@@ -70,59 +66,62 @@ if not areas_opts:
     st.warning("Nenhuma área ativa encontrada na aba 'Nomes'. Verifique a planilha/credenciais.")
 else:
     labels = [a["area"] for a in areas_opts]
-    areas_sel = st.multiselect(
-        "Áreas / Setores",
-        options=labels,
-        placeholder="Escolha uma ou mais áreas",
-    )
-    nome_input = st.text_input("Nome", max_chars=80)
-    nome = nome_input.strip()
-    telefone_input = st.text_input("Telefone", max_chars=30, placeholder="92981231234")
-    telefone_feedback = st.empty()
-    rede_social_input = st.text_input(
-        "Rede social (@...)",
-        max_chars=80,
-        placeholder="@seudominio",
-        help="Opcional. Informe o usuário ou perfil principal.",
-    )
-    email_input = st.text_input(
-        "E-mail",
-        max_chars=120,
-        placeholder="nome@exemplo.com",
-        help="Opcional. Será armazenado apenas na planilha.",
-    )
-    telefone_ok = True
-    telefone_msg = ""
-    telefone_preview = ""
-    if telefone_input.strip():
-        try:
-            telefone_preview = format_phone_number(telefone_input)
-        except ValueError as exc:
-            telefone_ok = False
-            telefone_msg = str(exc)
-    else:
-        telefone_ok = False
-        telefone_msg = "Informe o telefone com 11 dígitos (incluindo DDD)."
-
-    if telefone_msg:
-        telefone_feedback.caption(f"ℹ️ {telefone_msg}")
-    elif telefone_preview:
-        telefone_feedback.caption(f"Formato final: {telefone_preview}")
-    if bairros_opts:
-        bairro = st.selectbox("Bairro", options=[""] + bairros_opts, index=0)
-    else:
-        st.info(
-            "Lista de bairros não encontrada na aba 'Bairro'. Informe manualmente abaixo ou verifique a planilha."
+    # Formulário: os widgets só disparam rerun (e leituras da planilha) no envio
+    with st.form("ticket_form", clear_on_submit=False):
+        areas_sel = st.multiselect(
+            "Áreas / Setores",
+            options=labels,
+            placeholder="Escolha uma ou mais áreas",
         )
-        bairro = st.text_input("Bairro", max_chars=80)
-
-    btn = st.button(
-        "✅ Gerar senhas e salvar",
-        type="primary",
-        disabled=(not areas_sel or not nome or not telefone_ok),
-    )
+        nome_input = st.text_input("Nome", max_chars=80)
+        nome = nome_input.strip()
+        telefone_input = st.text_input("Telefone", max_chars=30, placeholder="92981231234")
+        telefone_feedback = st.empty()
+        rede_social_input = st.text_input(
+            "Rede social (@...)",
+            max_chars=80,
+            placeholder="@seudominio",
+            help="Opcional. Informe o usuário ou perfil principal.",
+        )
+        email_input = st.text_input(
+            "E-mail",
+            max_chars=120,
+            placeholder="nome@exemplo.com",
+            help="Opcional. Será armazenado apenas na planilha.",
+        )
+        telefone_ok = True
+        telefone_msg = ""
+        telefone_preview = ""
+        if telefone_input.strip():
+            try:
+                telefone_preview = format_phone_number(telefone_input)
+            except ValueError as exc:
+                telefone_ok = False
+                telefone_msg = str(exc)
+        else:
+            telefone_ok = False
+            telefone_msg = "Informe o telefone com 11 dígitos (incluindo DDD)."
+
+        if telefone_msg:
+            telefone_feedback.caption(f"ℹ️ {telefone_msg}")
+        elif telefone_preview:
+            telefone_feedback.caption(f"Formato final: {telefone_preview}")
+        if bairros_opts:
+            bairro = st.selectbox("Bairro", options=[""] + bairros_opts, index=0)
+        else:
+            st.info(
+                "Lista de bairros não encontrada na aba 'Bairro'. Informe manualmente abaixo ou verifique a planilha."
+            )
+            bairro = st.text_input("Bairro", max_chars=80)
+
+        btn = st.form_submit_button("✅ Gerar senhas e salvar", type="primary")
+
+    if btn and not (areas_sel and nome and telefone_ok):
+        st.error("Escolha ao menos uma área e informe nome e telefone válidos.")
+        btn = False
 
     if btn:
+        st.session_state.pop("last_pdf", None)
         with st.spinner("Gravando na planilha e gerando PDF..."):
             try:
                 submit_kwargs = {
@@ -176,12 +175,9 @@ else:
                     safe_name = re.sub(r"[^A-Za-z0-9_-]+", "_", base_name).strip("_") or "senhas"
                     file_name = f"{safe_name}.pdf"
 
-                    st.download_button(
-                        "⬇️ Baixar PDF das senhas",
-                        data=pdf_bytes,
-                        file_name=file_name,
-                        mime="application/pdf",
-                    )
+                    # Mantém o PDF entre reruns: o download não depende mais do clique no botão
+                    senhas = [(item["area"], item["senha"]) for item in resultados]
+                    st.session_state["last_pdf"] = (pdf_bytes, file_name, senhas, resultados[0]["ts_registro"])
                     ok, err = enviar_para_impressao(pdf_bytes)
                     if ok:
                         st.success("🖨️ Enviado automaticamente para impressão.")
@@ -191,3 +187,18 @@ else:
                 st.error(str(e))
             except Exception as e:
                 st.error(f"Falha ao gerar senha: {e}")
+
+    last_pdf = st.session_state.get("last_pdf")
+    if last_pdf:
+        pdf_bytes, file_name, senhas, ts = last_pdf
+        resumo = ", ".join(f"{area} → {senha}" for area, senha in senhas)
+        st.caption(f"Último registro ({ts}): {resumo}")
+        st.download_button(
+            "⬇️ Baixar PDF das senhas",
+            data=pdf_bytes,
+            file_name=file_name,
+            mime="application/pdf",
+        )
+        if st.button("🧹 Limpar último registro"):
+            st.session_state.pop("last_pdf", None)
+            st.rerun()
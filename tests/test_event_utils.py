@@ -0,0 +1,152 @@
+import pytest
+
+event_utils = pytest.importorskip("event_utils")
+httplib2 = pytest.importorskip("httplib2")
+
+from googleapiclient.errors import HttpError  # noqa: E402
+
+
+class _Call:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self, num_retries=0):
+        return self._fn()
+
+
+class FakeService:
+    """Stub mínimo do cliente do Sheets: cada aba guarda só os valores efetivos da coluna A."""
+
+    def __init__(self, sheets):
+        # título -> [sheetId, valores da coluna A (linha 1 = cabeçalho)]
+        self.sheets = {title: [sheet_id, list(col)] for title, (sheet_id, col) in sheets.items()}
+        self.get_calls = 0
+        self.batch_updates = []
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def get(self, spreadsheetId, fields=None):
+        def run():
+            self.get_calls += 1
+            return {"sheets": [
+                {"properties": {"title": title, "sheetId": sheet_id}}
+                for title, (sheet_id, _) in self.sheets.items()
+            ]}
+        return _Call(run)
+
+    def batchGet(self, spreadsheetId, ranges):
+        def run():
+            value_ranges = []
+            for rng in ranges:
+                col = self.sheets[rng.split("!")[0]][1]
+                value_ranges.append({"values": [[col[0]]]} if col and col[0] else {})
+            return {"valueRanges": value_ranges}
+        return _Call(run)
+
+    def batchUpdate(self, spreadsheetId, body, fields=None):
+        return _Call(lambda: self._apply(body))
+
+    def _apply(self, body):
+        by_id = {sheet[0]: sheet for sheet in self.sheets.values()}
+        added = {req["addSheet"]["properties"]["sheetId"] for req in body["requests"] if "addSheet" in req}
+        for req in body["requests"]:
+            for kind in ("updateCells", "appendCells"):
+                if kind in req:
+                    sheet_id = req[kind]["start"]["sheetId"] if kind == "updateCells" else req[kind]["sheetId"]
+                    if sheet_id not in by_id and sheet_id not in added:
+                        raise HttpError(httplib2.Response({"status": "400"}), b"No grid with id")
+
+        self.batch_updates.append(body)
+        for req in body["requests"]:
+            if "addSheet" in req:
+                props = req["addSheet"]["properties"]
+                self.sheets[props["title"]] = by_id[props["sheetId"]] = [props["sheetId"], []]
+            elif "updateCells" in req:
+                col = by_id[req["updateCells"]["start"]["sheetId"]][1]
+                header = req["updateCells"]["rows"][0]["values"][0]["userEnteredValue"]["stringValue"]
+                if col:
+                    col[0] = header
+                else:
+                    col.append(header)
+            elif "appendCells" in req:
+                col = by_id[req["appendCells"]["sheetId"]][1]
+                col.append(len(col))  # =ROW()-1 da nova linha
+
+        sheets = []
+        for rng in body["responseRanges"]:
+            title = rng.split("!")[0]
+            row_data = []
+            for v in self.sheets[title][1]:
+                if v in ("", None):
+                    row_data.append({})
+                elif isinstance(v, str):
+                    row_data.append({"values": [{"effectiveValue": {"stringValue": v}}]})
+                else:
+                    row_data.append({"values": [{"effectiveValue": {"numberValue": v}}]})
+            sheets.append({"properties": {"title": title}, "data": [{"rowData": row_data}]})
+        return {"updatedSpreadsheet": {"sheets": sheets}}
+
+
+def _row(nome):
+    return ["", nome, "(92) 98123-1234", "", "", "Centro", "15/10/2026 10:00:00", ""]
+
+
+@pytest.fixture(autouse=True)
+def _clear_sheet_caches():
+    event_utils._SHEET_IDS_CACHE.clear()
+    event_utils._HEADER_CHECKED.clear()
+    yield
+    event_utils._SHEET_IDS_CACHE.clear()
+    event_utils._HEADER_CHECKED.clear()
+
+
+def test_append_tickets_several_entries_on_same_sheet():
+    service = FakeService({"A": (1, ["Senha", 1, 2, 3]), "B": (2, ["Senha"])})
+
+    senhas = event_utils.append_tickets(
+        service, "sid", [("A", _row("X")), ("B", _row("Y")), ("A", _row("Z"))]
+    )
+
+    assert senhas == [4, 1, 5]
+    assert len(service.batch_updates) == 1
+    assert service.sheets["A"][1] == ["Senha", 1, 2, 3, 4, 5]
+
+
+def test_append_tickets_creates_missing_sheet_with_header_in_same_batch():
+    service = FakeService({"A": (1, ["Senha", 1])})
+
+    senhas = event_utils.append_tickets(service, "sid", [("Nova", _row("X")), ("A", _row("Y"))])
+
+    assert senhas == [1, 2]
+    assert len(service.batch_updates) == 1
+    kinds = [next(iter(req)) for req in service.batch_updates[0]["requests"]]
+    assert kinds == ["addSheet", "updateCells", "appendCells", "appendCells"]
+    new_id = service.batch_updates[0]["requests"][0]["addSheet"]["properties"]["sheetId"]
+    assert new_id != 1
+    assert service.sheets["Nova"] == [new_id, ["Senha", 1]]
+    assert event_utils._SHEET_IDS_CACHE["sid"]["Nova"] == new_id
+
+
+def test_append_tickets_writes_header_on_existing_empty_sheet():
+    service = FakeService({"A": (1, [])})
+
+    assert event_utils.append_tickets(service, "sid", [("A", _row("X"))]) == [1]
+    kinds = [next(iter(req)) for req in service.batch_updates[0]["requests"]]
+    assert kinds == ["updateCells", "appendCells"]
+    assert service.sheets["A"][1] == ["Senha", 1]
+
+
+def test_append_tickets_refreshes_stale_sheet_ids_on_400():
+    service = FakeService({"A": (7, ["Senha", 1])})
+    event_utils._SHEET_IDS_CACHE["sid"] = {"A": 3}  # aba recriada: sheetId em cache não existe mais
+
+    senhas = event_utils.append_tickets(service, "sid", [("A", _row("X"))])
+
+    assert senhas == [2]
+    assert service.get_calls == 1
+    assert len(service.batch_updates) == 1
+    assert event_utils._SHEET_IDS_CACHE["sid"] == {"A": 7}
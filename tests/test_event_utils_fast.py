@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("numpy")
+event_utils = pytest.importorskip("event_utils")
+
+from event_utils_fast import format_phones_bulk, normalize_ascii_bulk  # noqa: E402
+
+PHONES = [
+    "92981231234",
+    "(92) 98123-1234",
+    "+55 (92) 98123-1234",
+    "5592981231234",
+    "4492981231234",
+    "929812312345",
+    "9298123123",
+    "55929812312345",
+    "  92 9 8123 1234  ",
+    "92981231234🙂",
+    "٩٢981231234",
+    "abc",
+    "",
+]
+
+
+def _reference(telefone):
+    try:
+        return event_utils.format_phone_number(telefone)
+    except ValueError:
+        return None
+
+
+def test_format_phones_bulk_matches_format_phone_number():
+    assert format_phones_bulk(PHONES) == [_reference(t) for t in PHONES]
+
+
+def test_normalize_ascii_bulk_matches_normalize_for_ascii_decomposable_text():
+    names = ["  Área/Setor ", "Disponível", "AÇÃO", "Qtd máxima", "", "\tÉ\n", "\x1fÁrea\x1c"]
+    assert normalize_ascii_bulk(names) == [event_utils._normalize(n) for n in names]
+
+
+def test_normalize_ascii_bulk_drops_characters_without_ascii_decomposition():
+    assert normalize_ascii_bulk(["Straße", "Søren"]) == ["strae", "sren"]